@@ -7,6 +7,7 @@ import os
 import json
 import time
 import logging
+from facets_v1 import PRICE_BUCKET_SIZE, RATING_BUCKET_SIZE, facet_counts_query
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -52,6 +53,7 @@ def create_table_if_not_exists(conn):
             length TEXT,
             clasp TEXT,
             model_number TEXT,
+            brand TEXT,
             reviewer_name_1 TEXT,
             review_text_1 TEXT,
             review_rating_1 TEXT,
@@ -68,6 +70,9 @@ def create_table_if_not_exists(conn):
         );
         """
         cursor.execute(create_table_query)
+
+        # Tables created before the brand column existed
+        cursor.execute("ALTER TABLE amazon_watches ADD COLUMN IF NOT EXISTS brand TEXT;")
         conn.commit()
 
 # Function to insert data into the database
@@ -75,17 +80,18 @@ def insert_data(conn, data):
     with conn.cursor() as cursor:
         insert_query = sql.SQL("""
             INSERT INTO amazon_watches (title, price, overall_rating, total_reviews, availability,
-                                          model, material, item_length, length, clasp, model_number,
+                                          model, material, item_length, length, clasp, model_number, brand,
                                           reviewer_name_1, review_text_1, review_rating_1, review_date_1,
                                           reviewer_name_2, review_text_2, review_rating_2, review_date_2,
                                           reviewer_name_3, review_text_3, review_rating_3, review_date_3,
                                           link)
             VALUES (%s, %s, %s, %s, %s,
-                    %s, %s, %s, %s, %s, %s,
+                    %s, %s, %s, %s, %s, %s, %s,
                     %s, %s, %s, %s,
                     %s, %s, %s, %s,
                     %s, %s, %s, %s,
-                    %s) ON CONFLICT (link) DO NOTHING;  -- Handle duplicate links
+                    %s) ON CONFLICT (link) DO UPDATE  -- Handle duplicate links
+                SET brand = COALESCE(amazon_watches.brand, EXCLUDED.brand);  -- Backfill rows scraped before the brand column
         """)
         cursor.execute(insert_query, (
             data.get("title"),
@@ -99,6 +105,7 @@ def insert_data(conn, data):
             data.get("Length"),
             data.get("Clasp"),
             data.get("Model number"),
+            data.get("Brand, Seller, or Collection Name"),
             data.get("reviewer_name_1"),
             data.get("review_text_1"),
             data.get("review_rating_1"),
@@ -116,6 +123,65 @@ def insert_data(conn, data):
         conn.commit()
 
 
+# Bump whenever the facets view definitions (including facets_v1.py) change
+FACETS_VIEW_VERSION = "3"
+
+# Function to (re)create the facets materialized views when missing or outdated
+def create_facets_views_if_outdated(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT obj_description(to_regclass('amazon_watches_facets'), 'pg_class');")
+        if cursor.fetchone()[0] == FACETS_VIEW_VERSION:
+            return False
+
+        cursor.execute("DROP MATERIALIZED VIEW IF EXISTS amazon_watches_facet_counts;")
+        cursor.execute("DROP MATERIALIZED VIEW IF EXISTS amazon_watches_facets;")
+
+        # One row per product with price and rating parsed once per refresh
+        cursor.execute("""
+        CREATE MATERIALIZED VIEW amazon_watches_facets AS
+            SELECT id, title,
+                   NULLIF(TRIM(model), '') AS model,
+                   NULLIF(TRIM(brand), '') AS brand,
+                   NULLIF(TRIM(material), '') AS material,
+                   NULLIF(TRIM(clasp), '') AS clasp,
+                   CAST(SUBSTRING(price FROM '([0-9]+(\\.[0-9]+)?)') AS FLOAT) AS price,
+                   CAST(SUBSTRING(overall_rating FROM '([0-9]+(\\.[0-9]+)?)') AS FLOAT) AS overall_rating
+            FROM amazon_watches
+        WITH NO DATA;
+        """)
+
+        # A unique index is required for REFRESH MATERIALIZED VIEW CONCURRENTLY
+        cursor.execute("CREATE UNIQUE INDEX amazon_watches_facets_id_idx ON amazon_watches_facets (id);")
+        cursor.execute("CREATE INDEX amazon_watches_facets_price_idx ON amazon_watches_facets (price);")
+        cursor.execute("CREATE INDEX amazon_watches_facets_rating_idx ON amazon_watches_facets (overall_rating);")
+
+        # Trigram indexes for the title/model ILIKE '%...%' filters
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+        cursor.execute("CREATE INDEX amazon_watches_facets_title_trgm_idx ON amazon_watches_facets USING GIN (title gin_trgm_ops);")
+        cursor.execute("CREATE INDEX amazon_watches_facets_model_trgm_idx ON amazon_watches_facets USING GIN (model gin_trgm_ops);")
+
+        # Unfiltered facet counts and histograms, aggregated and ranked once per refresh
+        cursor.execute(
+            f"CREATE MATERIALIZED VIEW amazon_watches_facet_counts AS {facet_counts_query()} WITH NO DATA;",
+            (PRICE_BUCKET_SIZE, RATING_BUCKET_SIZE)
+        )
+        cursor.execute("CREATE UNIQUE INDEX amazon_watches_facet_counts_idx ON amazon_watches_facet_counts (facet, value);")
+        cursor.execute("CREATE INDEX amazon_watches_facet_counts_rank_idx ON amazon_watches_facet_counts (facet, facet_rank);")
+
+        cursor.execute(f"COMMENT ON MATERIALIZED VIEW amazon_watches_facets IS '{FACETS_VIEW_VERSION}';")
+    # Left uncommitted so the new views are only visible once refresh_facets_views has populated them
+    return True
+
+# Function to refresh the facets materialized views
+def refresh_facets_views(conn, concurrently=True):
+    # CONCURRENTLY keeps the views readable but only works once they hold data
+    refresh = "REFRESH MATERIALIZED VIEW CONCURRENTLY" if concurrently else "REFRESH MATERIALIZED VIEW"
+    with conn.cursor() as cursor:
+        cursor.execute(f"{refresh} amazon_watches_facets;")
+        cursor.execute(f"{refresh} amazon_watches_facet_counts;")
+        conn.commit()
+
+
 # Function to extract Product Title
 def get_title(soup):
 
@@ -309,5 +375,10 @@ if __name__ == '__main__':
         df = pd.DataFrame(data_list)
         df.to_csv("amazon_watch_data_with_specs_5.csv", index=False)
 
+        # Refresh the facet aggregates served by /products/facets
+        created = create_facets_views_if_outdated(conn)
+        refresh_facets_views(conn, concurrently=not created)
+        logging.info("Refreshed facets materialized views")
+
     finally:
         conn.close()  # Close the database connection
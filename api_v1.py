@@ -1,11 +1,13 @@
 from fastapi import FastAPI, Query, HTTPException
 from pydantic import BaseModel
 import psycopg2
+from psycopg2.errors import UndefinedTable, ObjectNotInPrerequisiteState
 import json
 from typing import List, Optional, Dict
 import re
 import uvicorn
 from utility_v1 import *
+from facets_v1 import PRICE_BUCKET_SIZE, RATING_BUCKET_SIZE, facet_counts_query
 
 
 global documents, document_embeddings, index
@@ -63,6 +65,26 @@ class AskRequest(BaseModel):
     query: str
 
 
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+
+class HistogramBucket(BaseModel):
+    min: float
+    max: float
+    count: int
+
+
+class ProductFacets(BaseModel):
+    total: int
+    brand: List[FacetCount]
+    material: List[FacetCount]
+    clasp: List[FacetCount]
+    price_histogram: List[HistogramBucket]
+    rating_histogram: List[HistogramBucket]
+
+
 # Helper function to extract numeric values
 def extract_numeric(value: str) -> float:
     match = re.search(r"(\d+(\.\d+)?)", value)
@@ -200,6 +222,96 @@ async def get_top_products(limit: int = Query(10, ge=1)):
         conn.close()
 
 
+# GET /products/facets
+@app.get("/products/facets", response_model=ProductFacets)
+async def get_product_facets(
+    brand: str = Query(None),
+    model: str = Query(None),
+    min_price: float = Query(None),
+    max_price: float = Query(None),
+    min_rating: float = Query(None),
+    price_bucket: float = Query(None, gt=0),
+    facet_limit: int = Query(20, ge=1)
+):
+    params = []
+    conditions = []
+
+    # Same filters as /products, applied to the amazon_watches_facets view
+    if brand:
+        conditions.append("title ILIKE %s")
+        params.append(f"%{brand}%")
+
+    if model:
+        conditions.append("model ILIKE %s")
+        params.append(f"%{model}%")
+
+    if min_price is not None:
+        conditions.append("price >= %s")
+        params.append(min_price)
+
+    if max_price is not None:
+        conditions.append("price <= %s")
+        params.append(max_price)
+
+    if min_rating is not None:
+        conditions.append("overall_rating >= %s")
+        params.append(min_rating)
+
+    if not conditions and price_bucket is None:
+        # Unfiltered requests are answered from the precomputed counts
+        source = "amazon_watches_facet_counts"
+    else:
+        # Filtered requests aggregate the matching rows in a single pass
+        where_clause = " AND ".join(conditions) if conditions else "TRUE"
+        source = f"({facet_counts_query(where_clause)}) AS facet_counts"
+        params = [price_bucket or PRICE_BUCKET_SIZE, RATING_BUCKET_SIZE] + params
+
+    # Keep the top facet_limit values per facet; histograms and the total are always returned
+    query = f"""
+        SELECT facet, value, count, bucket_size
+        FROM {source}
+        WHERE (facet IN ('brand', 'material', 'clasp') AND facet_rank <= %s)
+           OR facet IN ('price', 'overall_rating', 'total')
+        ORDER BY facet, facet_rank;
+    """
+    params.append(facet_limit)
+
+    conn = connect_db()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+    except (UndefinedTable, ObjectNotInPrerequisiteState):
+        raise HTTPException(status_code=503, detail="Facets are not available yet. Run amazon_watches_v2.py to build them.")
+    finally:
+        conn.close()
+
+    total = 0
+    facets = {"brand": [], "material": [], "clasp": []}
+    histograms = {"price": [], "overall_rating": []}
+
+    for facet, value, count, bucket_size in rows:
+        if facet == "total":
+            total = count
+        elif facet in facets:
+            facets[facet].append({"value": value, "count": count})
+        else:
+            bucket = float(value)
+            histograms[facet].append({"min": bucket, "max": bucket + bucket_size, "count": count})
+
+    for facet in histograms:
+        histograms[facet].sort(key=lambda b: b["min"])
+
+    return {
+        "total": total,
+        "brand": facets["brand"],
+        "material": facets["material"],
+        "clasp": facets["clasp"],
+        "price_histogram": histograms["price"],
+        "rating_histogram": histograms["overall_rating"],
+    }
+
+
 # GET /products/{product_id}/reviews
 @app.get("/products/{product_id}/reviews", response_model=List[Review])
 async def get_product_reviews(product_id: int, page: int = Query(1, ge=1), limit: int = Query(10, ge=1)):
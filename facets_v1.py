@@ -0,0 +1,49 @@
+# Facet aggregation shared by amazon_watches_v2.py (materialized views) and api_v1.py (/products/facets)
+
+
+# Default histogram bucket widths
+PRICE_BUCKET_SIZE = 50.0
+RATING_BUCKET_SIZE = 0.5
+
+
+# Function to build the facet counts query over amazon_watches_facets
+# Params: price bucket size, rating bucket size, then the params of where_clause
+def facet_counts_query(where_clause="TRUE"):
+    return f"""
+        WITH sizes AS (
+            SELECT %s::FLOAT AS price_size, %s::FLOAT AS rating_size
+        ),
+        bucketed AS (
+            SELECT LOWER(brand) AS brand_key, brand, material, clasp,
+                   FLOOR(price / price_size) * price_size AS price_bucket, price_size,
+                   FLOOR(overall_rating / rating_size) * rating_size AS rating_bucket, rating_size
+            FROM amazon_watches_facets CROSS JOIN sizes
+            WHERE {where_clause}
+        ),
+        grouped AS (
+            SELECT CASE
+                       WHEN GROUPING(brand_key) = 0 THEN 'brand'
+                       WHEN GROUPING(material) = 0 THEN 'material'
+                       WHEN GROUPING(clasp) = 0 THEN 'clasp'
+                       WHEN GROUPING(price_bucket) = 0 THEN 'price'
+                       WHEN GROUPING(rating_bucket) = 0 THEN 'overall_rating'
+                       ELSE 'total'
+                   END AS facet,
+                   -- Brands are grouped case-insensitively and shown with their most common spelling
+                   CASE
+                       WHEN GROUPING(brand_key) = 0 THEN MODE() WITHIN GROUP (ORDER BY brand)
+                       ELSE COALESCE(material, clasp, price_bucket::TEXT, rating_bucket::TEXT)
+                   END AS value,
+                   CASE
+                       WHEN GROUPING(price_bucket) = 0 THEN MAX(price_size)
+                       WHEN GROUPING(rating_bucket) = 0 THEN MAX(rating_size)
+                   END AS bucket_size,
+                   COUNT(*) AS count
+            FROM bucketed
+            GROUP BY GROUPING SETS ((brand_key), (material), (clasp), (price_bucket), (rating_bucket), ())
+        )
+        SELECT facet, COALESCE(value, '') AS value, count, bucket_size,
+               ROW_NUMBER() OVER (PARTITION BY facet ORDER BY count DESC, value) AS facet_rank
+        FROM grouped
+        WHERE value IS NOT NULL OR facet = 'total'
+    """